@@ -1,40 +1,97 @@
 #!/usr/bin/env python3
-import os, re, sys, json, subprocess
+import os, re, io, sys, json, shutil, subprocess, threading
+import runpy, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 MEDIA_EXTENSIONS = (".mkv", ".mp4", ".avi", ".mov", ".wmv", ".m4v")
+_MEDIA_EXT_SET = frozenset(MEDIA_EXTENSIONS)
+
+# Max input/output duration drift accepted without a decode test (~1 frame at 25fps)
+DURATION_TOLERANCE_MS = 40
+# Decode-test timeout floor (s). Above it, demux tests scale with file size at
+# an assumed minimum read throughput (network mounts included), and audio
+# decode tests with duration at a minimum speed relative to realtime.
+DECODE_TEST_TIMEOUT = 90
+DEMUX_MIN_BYTES_PER_SEC = 20 * 1024 * 1024
+AUDIO_DECODE_MIN_SPEED = 10
+
+# ---------- subprocess ----------
+# CPython launches children with posix_spawn instead of fork+exec only when the
+# executable is a path and close_fds is off. Our own fds are non-inheritable
+# (PEP 446), so close_fds=False is safe for every call in this script.
+@lru_cache(maxsize=None)
+def _exe(name):
+    return shutil.which(name) or name
+
+def _spawnable(cmd):
+    return [_exe(cmd[0]), *cmd[1:]]
 
 # ---------- ffprobe ----------
-def run_ffprobe(file):
+# One ffprobe call per file: stream entries plus container duration.
+PROBE_ENTRIES = "format=duration:stream=index,codec_type,codec_name,channels,channel_layout,color_primaries,color_transfer:stream_tags=language,title,handler_name"
+
+# Cached on (path, size, mtime_ns) so a file that changes on disk is re-probed.
+@lru_cache(maxsize=256)
+def _probe_cached(path, size, mtime_ns):
     cmd = [
         "ffprobe", "-v", "error",
-        "-show_entries",
-        "stream=index,codec_type,codec_name,profile,width,height,channels,channel_layout,color_primaries,color_transfer,color_space:stream_tags=language,title,handler_name",
-        "-of", "json", file
+        "-show_entries", PROBE_ENTRIES,
+        "-of", "json", path
     ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # Bytes output: orjson parses it directly, json.loads decodes it as UTF-8
+    result = subprocess.run(_spawnable(cmd), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=False)
     try:
-        return json.loads(result.stdout)
-    except json.JSONDecodeError:
+        return _json_loads(result.stdout)
+    except ValueError:
+        return None
+
+def run_ffprobe(file):
+    try:
+        st = os.stat(file)
+    except OSError:
+        return {"streams": []}
+    data = _probe_cached(file, st.st_size, st.st_mtime_ns)
+    if data is None:
         return {"streams": []}
+    data.setdefault("streams", [])
+    return data
 
-# Duration-only ffprobe for validation
-def get_duration_ms(file):
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "json", file
-    ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+def _duration_ms_from_probe(probe):
     try:
-        data = json.loads(result.stdout)
-        dur = float(data.get("format", {}).get("duration", "0"))
+        dur = float(probe.get("format", {}).get("duration", "0"))
         return int(round(dur * 1000))
     except Exception:
         return None
 
+# Duration for validation; reuses the cached probe of the file
+def get_duration_ms(file):
+    probe = run_ffprobe(file)
+    if "format" not in probe:
+        return None
+    return _duration_ms_from_probe(probe)
+
 # ---------- helpers ----------
+_ENGLISH = frozenset(("en", "eng", "english"))
+# Capitalizations seen in real tags; matched without allocating a lowered copy
+_ENGLISH_EXACT = frozenset(("en", "eng", "english", "EN", "ENG", "ENGLISH", "En", "Eng", "English"))
+_KEEP_CODECS = frozenset(("truehd", "eac3", "dts"))
+
 def is_english(lang):
-    return lang and lang.lower() in {"en", "eng", "english"}
+    if lang in _ENGLISH_EXACT:
+        return True
+    # First-char guard skips the lower() for most non-English tags
+    return bool(lang) and lang[0] in ("e", "E") and lang.lower() in _ENGLISH
 
 LAYOUT_TO_COUNT = {
     "mono":1,"1.0":1,
@@ -46,14 +103,27 @@ LAYOUT_TO_COUNT = {
     "7.1(wide)":8
 }
 
+_LAYOUT_RE = re.compile(r"(\d+)\.(\d+)")
+
+# Per-stream results are memoized on the ffprobe dict under "_"-prefixed keys;
+# the dicts never leave this script, so the extra keys are harmless.
+_MISSING = object()
+
 def channel_count(s):
+    c = s.get("_ch", _MISSING)
+    if c is _MISSING:
+        c = _compute_channels(s)
+        s["_ch"] = c
+    return c
+
+def _compute_channels(s):
     ch = s.get("channels")
     if isinstance(ch, int) and ch > 0:
         return ch
     layout = (s.get("channel_layout") or "").lower()
     if layout in LAYOUT_TO_COUNT:
         return LAYOUT_TO_COUNT[layout]
-    m = re.match(r"(\d+)\.(\d+)", layout)
+    m = _LAYOUT_RE.match(layout)
     if m:
         return int(m.group(1)) + int(m.group(2))
     return "?"
@@ -70,13 +140,38 @@ def detect_hdr(s):
         return "Dolby Vision"
     return "SDR"
 
+# Title/handler markers for 3D audio; matched in a single pass when pyahocorasick is available
+_EXT_PATTERNS = {"atmos": "atmos", "dts:x": "dtsx", "dtsx": "dtsx"}
+
+if ahocorasick is not None:
+    _EXT_AUTOMATON = ahocorasick.Automaton()
+    for _key, _val in _EXT_PATTERNS.items():
+        _EXT_AUTOMATON.add_word(_key, _val)
+    _EXT_AUTOMATON.make_automaton()
+else:
+    _EXT_AUTOMATON = None
+
+def _extension_hits(text):
+    if _EXT_AUTOMATON is not None:
+        return {v for _, v in _EXT_AUTOMATON.iter(text)}
+    return {v for k, v in _EXT_PATTERNS.items() if k in text}
+
 def detect_audio_extension(s):
+    ext = s.get("_ext", _MISSING)
+    if ext is _MISSING:
+        ext = _compute_audio_extension(s)
+        s["_ext"] = ext
+    return ext
+
+def _compute_audio_extension(s):
     codec = (s.get("codec_name") or "").lower()
     tags = s.get("tags") or {}
     title = (tags.get("title") or "").lower()
     handler = (tags.get("handler_name") or "").lower()
-    has_atmos = "atmos" in title or "atmos" in handler
-    has_dtsx  = "dts:x" in title or "dts:x" in handler or "dtsx" in title or "dtsx" in handler
+    # NUL separator keeps a match from spanning title and handler
+    hits = _extension_hits(title + "\x00" + handler)
+    has_atmos = "atmos" in hits
+    has_dtsx  = "dtsx" in hits
     return codec, has_atmos, has_dtsx
 
 def codec_label(s):
@@ -98,18 +193,24 @@ def audio_label(s):
     ch = channel_count(s)
     return f"{codec_label(s)}-{ch} ({lang})"
 
-def summarize(streams):
-    hdr = "SDR"
-    audio_lines = []
-    subs_langs = []
-    for s in streams.get("streams", []):
-        st = s.get("codec_type")
-        if st == "video":
-            hdr = detect_hdr(s)
-        elif st == "audio":
-            audio_lines.append(audio_label(s))
-        elif st == "subtitle":
-            subs_langs.append((s.get("tags") or {}).get("language", "Unknown"))
+def _partition(streams):
+    """Split ffprobe streams into (video, audio, subs) lists in one pass."""
+    video, audio, subs = [], [], []
+    for s in streams.get("streams", ()):
+        t = s.get("codec_type")
+        if t == "video":
+            video.append(s)
+        elif t == "audio":
+            audio.append(s)
+        elif t == "subtitle":
+            subs.append(s)
+    return video, audio, subs
+
+def summarize(parts):
+    video, audio, subs = parts
+    hdr = detect_hdr(video[-1]) if video else "SDR"
+    audio_lines = [audio_label(s) for s in audio]
+    subs_langs = [(s.get("tags") or {}).get("language", "Unknown") for s in subs]
     return (
         f"HDR: {hdr}\n"
         f"Audio streams ({len(audio_lines)}): {', '.join(audio_lines)}\n"
@@ -132,7 +233,7 @@ def wait_for_key():
         return msvcrt.getch().decode().lower()
 
 # ---------- rule engine ----------
-def apply_rules(streams):
+def apply_rules(parts):
     """
     Rules:
       1. Keep all English TrueHD/EAC3/DTS streams (they can carry 3D audio).
@@ -142,9 +243,10 @@ def apply_rules(streams):
       5. Remove all 2-channel English streams if there’s at least one English >2ch.
       6. If there isn’t at least one English AC3 3+ channel audio stream, create one.
     """
-    st = streams.get("streams", [])
-    audio_streams = [s for s in st if s.get("codec_type") == "audio"]
-    subs_streams  = [s for s in st if s.get("codec_type") == "subtitle"]
+    _, audio_streams, subs_streams = parts
+    audio_pos = {id(s): i for i, s in enumerate(audio_streams)}
+    subs_pos  = {id(s): i for i, s in enumerate(subs_streams)}
+    labels = {id(s): audio_label(s) for s in audio_streams}
 
     notes = []
     kept_audio = []
@@ -157,13 +259,13 @@ def apply_rules(streams):
         codec, has_atmos, has_dtsx = detect_audio_extension(s)
 
         # Keep all TrueHD/EAC3/DTS because they *can* contain 3D audio
-        if codec in {"truehd", "eac3", "dts"}:
+        if codec in _KEEP_CODECS:
             kept_audio.append(s)
             continue
 
         # Drop AAC always
         if codec == "aac":
-            notes.append(f"Drop {audio_label(s)} (AAC)")
+            notes.append(f"Drop {labels[id(s)]} (AAC)")
             continue
 
         # Keep AC3 (we'll enforce 3+ch via rule #6)
@@ -172,13 +274,16 @@ def apply_rules(streams):
             continue
 
         # Other codecs are dropped
-        notes.append(f"Drop {audio_label(s)} (unsupported codec for this rule set)")
+        notes.append(f"Drop {labels[id(s)]} (unsupported codec for this rule set)")
 
     # Remove 2ch if >2ch exists
-    has_gt2 = any(isinstance(channel_count(s), int) and channel_count(s) > 2 for s in kept_audio)
+    chs = [channel_count(s) for s in kept_audio]
+    has_gt2 = any(isinstance(ch, int) and ch > 2 for ch in chs)
     if has_gt2:
         before = len(kept_audio)
-        kept_audio = [s for s in kept_audio if isinstance(channel_count(s), int) and channel_count(s) > 2]
+        kept = [(s, ch) for s, ch in zip(kept_audio, chs) if isinstance(ch, int) and ch > 2]
+        kept_audio = [s for s, _ in kept]
+        chs = [ch for _, ch in kept]
         pruned = before - len(kept_audio)
         if pruned:
             notes.append(f"Removed {pruned} 2-channel English streams")
@@ -186,8 +291,8 @@ def apply_rules(streams):
     # Ensure AC3 3+ exists
     has_ac3_3plus = any(
         (s.get("codec_name") or "").lower() == "ac3" and
-        isinstance(channel_count(s), int) and channel_count(s) >= 3
-        for s in kept_audio
+        isinstance(ch, int) and ch >= 3
+        for s, ch in zip(kept_audio, chs)
     )
 
     audio_new_ac3 = None
@@ -198,15 +303,16 @@ def apply_rules(streams):
                 codec, has_atmos, has_dtsx = detect_audio_extension(s)
                 ch = channel_count(s)
                 ext = 100 if (has_atmos or has_dtsx) else 0
-                base = 50 if codec in {"truehd", "eac3", "dts"} else 10
+                base = 50 if codec in _KEEP_CODECS else 10
                 chs = ch if isinstance(ch, int) else 0
                 return ext + base + chs
             source = max(english_candidates, key=score)
             audio_new_ac3 = {
-                "source_audio_pos": position_within_type(audio_streams, source),
+                "source_audio_pos": audio_pos[id(source)],
                 "out_channels": 6,
                 "bitrate": "640k",
-                "desc": f"Create AC3-6 (eng) from {audio_label(source)}"
+                "source_label": labels[id(source)],
+                "desc": f"Create AC3-6 (eng) from {labels[id(source)]}"
             }
             notes.append(audio_new_ac3["desc"])
         else:
@@ -217,27 +323,22 @@ def apply_rules(streams):
     plan = {
         "video_copy": True,
         "audio_keep": [
-            {"pos": position_within_type(audio_streams, s), "desc": f"Keep {audio_label(s)}"}
+            {"pos": audio_pos[id(s)], "label": labels[id(s)], "desc": f"Keep {labels[id(s)]}"}
             for s in kept_audio
         ],
         "audio_new_ac3": audio_new_ac3,
         "subs_keep": [
-            {"pos": position_within_type(subs_streams, s), "desc": "Keep English subtitle"}
+            {"pos": subs_pos[id(s)], "desc": "Keep English subtitle"}
             for s in subs_keep
         ],
         "notes": notes
     }
     return plan
 
-def position_within_type(group, stream_obj):
-    for i, s in enumerate(group):
-        if s is stream_obj:
-            return i
-    return 0
-
 # ---------- ffmpeg command builder ----------
 def build_ffmpeg_command(infile, outfile, plan):
-    cmd = ["ffmpeg", "-y", "-i", infile]
+    # Progress goes to stdout as key=value blocks for run_reencode
+    cmd = ["ffmpeg", "-progress", "pipe:1", "-nostats", "-y", "-i", infile]
 
     if plan["video_copy"]:
         cmd += ["-map", "0:v:0", "-c:v", "copy"]
@@ -263,16 +364,26 @@ def build_ffmpeg_command(infile, outfile, plan):
     cmd += ["-map_metadata", "0", "-map_chapters", "0", outfile]
     return cmd
 
-def explain_command(cmd, plan):
+def render_plan(parts, plan):
+    """
+    Build the command explanation and the resulting-streams summary in one
+    pass over the plan. Returns (explanation, summary).
+    """
+    _, _, subs_streams = parts
     lines = []
+    out = []
+    lines.append("-progress pipe:1 -nostats: send progress to this script (shown as a one-line status) instead of ffmpeg's stats line.")
     lines.append("-y: overwrite the OUTPUT file if it already exists (input/original is never overwritten).")
     lines.append("-i INPUT: source file to read from.")
     if plan["video_copy"]:
         lines.append("-map 0:v:0 -c:v copy: keep the primary video stream as-is (no reencode).")
+    out.append("Video: copy original.")
     if plan["audio_keep"]:
         lines.append("Audio streams kept (copied):")
+        out.append("Audio kept:")
         for i, a in enumerate(plan["audio_keep"]):
             lines.append(f"  - -map 0:a:{a['pos']} -c:a:{i} copy → {a['desc']}")
+            out.append(f"  - {a['label']}")
     if plan["audio_new_ac3"]:
         i = len(plan["audio_keep"])
         src = plan["audio_new_ac3"]["source_audio_pos"]
@@ -282,87 +393,215 @@ def explain_command(cmd, plan):
             f"-ac:a:{i} {plan['audio_new_ac3']['out_channels']} "
             f"→ New AC3-6 (eng) track."
         )
-    if plan["subs_keep"]:
-        lines.append("Subtitles kept (copied):")
-        for i, s in enumerate(plan["subs_keep"]):
-            lines.append(f"  - -map 0:s:{s['pos']} -c:s:{i} copy → {s['desc']}")
-    lines.append("-map_metadata 0 -map_chapters 0: preserve original metadata and chapters.")
-    lines.append("OUTPUT.mkv: final Matroska output file.")
-    return "\n".join(lines)
-
-def summarize_resulting_plan(streams, plan):
-    audio_streams = [s for s in streams.get("streams", []) if s.get("codec_type") == "audio"]
-    subs_streams  = [s for s in streams.get("streams", []) if s.get("codec_type") == "subtitle"]
-    out = []
-    out.append("Video: copy original.")
-    if plan["audio_keep"]:
-        out.append("Audio kept:")
-        for a in plan["audio_keep"]:
-            s = audio_streams[a["pos"]]
-            out.append(f"  - {audio_label(s)}")
-    if plan["audio_new_ac3"]:
-        src = plan["audio_new_ac3"]["source_audio_pos"]
-        s = audio_streams[src]
         out.append("Audio added:")
-        out.append(f"  - New AC3-6 (eng) from {audio_label(s)}")
+        out.append(f"  - New AC3-6 (eng) from {plan['audio_new_ac3']['source_label']}")
     if plan["subs_keep"]:
+        lines.append("Subtitles kept (copied):")
         out.append("Subtitles kept:")
-        for splan in plan["subs_keep"]:
+        for i, splan in enumerate(plan["subs_keep"]):
+            lines.append(f"  - -map 0:s:{splan['pos']} -c:s:{i} copy → {splan['desc']}")
             s = subs_streams[splan["pos"]]
             lang = (s.get("tags") or {}).get("language", "Unknown")
             out.append(f"  - English subtitle (lang={lang})")
     else:
         out.append("Subtitles kept: none (non-English removed).")
+    lines.append("-map_metadata 0 -map_chapters 0: preserve original metadata and chapters.")
+    lines.append("OUTPUT.mkv: final Matroska output file.")
     if plan["notes"]:
         out.append("Decisions:")
         for n in plan["notes"]:
             out.append(f"  - {n}")
-    return "\n".join(out)
+    return "\n".join(lines), "\n".join(out)
 
 def quote_arg(a):
     return f"'{a}'" if re.search(r'\s', a) else a
 
+# ---------- reencode ----------
+def _fmt_ms(ms):
+    secs = ms // 1000
+    return f"{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}"
+
+def run_reencode(cmd, total_ms=None):
+    """
+    Run a build_ffmpeg_command command (which already has -progress pipe:1
+    -nostats) and show a one-line status from the progress blocks.
+    Errors still go to the terminal via stderr. Returns ffmpeg's exit code.
+    """
+    proc = subprocess.Popen(_spawnable(cmd), stdout=subprocess.PIPE, text=True, bufsize=1, close_fds=False)
+    progress = {}
+    try:
+        for line in proc.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            progress[key] = value
+            if key != "progress":
+                continue
+            # "progress" closes each key=value block
+            try:
+                done_ms = int(progress.get("out_time_us", "")) // 1000
+            except ValueError:
+                continue
+            pct = f"{min(100.0, 100.0 * done_ms / total_ms):5.1f}% " if total_ms else ""
+            print(f"\r  {pct}{_fmt_ms(done_ms)}  speed={progress.get('speed', '?').strip()}   ",
+                  end="", flush=True)
+        return proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        print()
+
+# ---------- mediainfo ----------
+def _stdout_fd():
+    try:
+        sys.stdout.flush()
+        return sys.stdout.fileno()
+    except (AttributeError, ValueError, io.UnsupportedOperation):
+        return None
+
+def run_mediainfo(mediainfo_path, name):
+    """
+    Run mediainfo.py on a file name and return its output.
+    The script is executed in-process as __main__ with sys.argv and sys.path[0]
+    set as for a command-line run, capturing file descriptor 1 so output from
+    its own child processes is included. Falls back to a python3 subprocess
+    when the script is missing or stdout has no file descriptor. Failures
+    raise CalledProcessError either way.
+    """
+    fd = _stdout_fd() if os.path.isfile(mediainfo_path) else None
+    if fd is None:
+        return subprocess.check_output(_spawnable(["python3", mediainfo_path, name]), text=True, close_fds=False)
+
+    argv = [mediainfo_path, name]
+    saved_argv, saved_path, saved_fd = sys.argv, sys.path[:], os.dup(fd)
+    with tempfile.TemporaryFile() as tmp:
+        os.dup2(tmp.fileno(), fd)
+        sys.argv = argv
+        sys.path.insert(0, os.path.dirname(os.path.abspath(mediainfo_path)))
+        code, error = 0, None
+        try:
+            runpy.run_path(mediainfo_path, run_name="__main__")
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            code, error = 1, e
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+            sys.argv = saved_argv
+            sys.path[:] = saved_path
+        tmp.seek(0)
+        output = tmp.read().decode(errors="replace")
+    if code:
+        raise subprocess.CalledProcessError(code, argv, output=output) from error
+    return output
+
 # ---------- validation ----------
-def validate_output_file(input_file, output_file):
+def run_decode_test(cmd, timeout):
+    """
+    Run an ffmpeg decode test, draining stderr as it arrives.
+    Stops ffmpeg at the first error line instead of waiting for it to finish.
+    Returns (returncode, first_error_line or None); raises TimeoutExpired.
+    """
+    # errors="replace": error lines often carry file paths that are not valid UTF-8
+    proc = subprocess.Popen(_spawnable(cmd), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            text=True, errors="replace", close_fds=False)
+    first_error = []
+
+    def drain():
+        try:
+            for line in proc.stderr:
+                if line.strip():
+                    first_error.append(line.strip())
+                    proc.kill()
+                    break
+        except Exception as e:
+            # A reader failure must never look like a clean run
+            first_error.append(f"(could not read ffmpeg output: {e})")
+            proc.kill()
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    reader.join(timeout)
+    timed_out = reader.is_alive()
+    if timed_out:
+        proc.kill()
+        reader.join()
+    proc.wait()
+    proc.stderr.close()
+    if timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return proc.returncode, (first_error[0] if first_error else None)
+
+def validate_output_file(input_file, output_file, full_decode=False, input_probe=None):
     """
     Hybrid validation:
-      1) Compare exact duration in ms via ffprobe.
-         - If identical → PASS.
-         - If any difference → run decode test.
-      2) Decode test: ffmpeg -v error -i output -f null -
+      1) Compare duration in ms via ffprobe.
+         - If within DURATION_TOLERANCE_MS → PASS.
+         - Otherwise → run decode test.
+      2) Decode test: ffmpeg -v error -i output ... -f null -
+         - Demux-only (-map 0 -c copy) unless full_decode is set, i.e. audio was reencoded;
+           then all audio is decoded while video and subtitles stay demux-only.
          - If exit code 0 and no errors → PASS.
          - Otherwise → FAIL.
     Returns (passed: bool, message: str)
     """
-    d_in = get_duration_ms(input_file)
+    # Reuse the probe process_file already has; the ffprobe cache may have
+    # evicted it by now in large directories
+    if input_probe is not None and "format" in input_probe:
+        d_in = _duration_ms_from_probe(input_probe)
+    else:
+        d_in = get_duration_ms(input_file)
     d_out = get_duration_ms(output_file)
 
-    if d_in is not None and d_out is not None and d_in == d_out:
-        return True, f"Durations match exactly ({d_in} ms)."
+    if d_in is not None and d_out is not None and abs(d_in - d_out) <= DURATION_TOLERANCE_MS:
+        if d_in == d_out:
+            return True, f"Durations match exactly ({d_in} ms)."
+        return True, f"Durations match within {DURATION_TOLERANCE_MS} ms ({d_in} ms vs {d_out} ms)."
 
     # Durations differ or missing → decode test
-    cmd = ["ffmpeg", "-v", "error", "-i", output_file, "-f", "null", "-"]
-    print("Running ffmpeg decode test (may take up to 90 seconds)...")
+    cmd = ["ffmpeg", "-v", "error", "-threads", str(os.cpu_count() or 1), "-i", output_file]
+    # Both modes read the whole file, so the demux budget applies to either
     try:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=90)
-        if proc.returncode == 0 and not proc.stderr.strip():
+        size = os.path.getsize(output_file)
+    except OSError:
+        size = 0
+    timeout = max(DECODE_TEST_TIMEOUT, size // DEMUX_MIN_BYTES_PER_SEC)
+    if full_decode:
+        # Video was stream-copied, so only the audio needs decoding
+        cmd += ["-map", "0:v?", "-map", "0:a", "-map", "0:s?", "-c:v", "copy", "-c:s", "copy"]
+        dur_ms = d_out or d_in or 0
+        timeout = max(timeout, dur_ms // 1000 // AUDIO_DECODE_MIN_SPEED)
+        kind = "audio decode"
+    else:
+        # -map 0 so every stream is checked, not just ffmpeg's default picks
+        cmd += ["-map", "0", "-c", "copy"]
+        kind = "demux"
+    cmd += ["-f", "null", "-"]
+    print(f"Running ffmpeg {kind} test (may take up to {timeout} seconds)...")
+    try:
+        returncode, error = run_decode_test(cmd, timeout=timeout)
+        if returncode == 0 and not error:
             return True, "Decode test passed with no errors (duration mismatch accepted)."
+        elif error:
+            return False, f"Decode test reported errors: {error}"
         else:
             return False, "Decode test reported errors or non-zero exit code."
     except subprocess.TimeoutExpired:
         return False, "Decode test timed out (validation failed)."
-    if proc.returncode == 0 and not proc.stderr.strip():
-        return True, "Decode test passed with no errors (duration mismatch accepted)."
-    else:
-        return False, "Decode test reported errors or non-zero exit code."
-def process_file(file):
-    streams = run_ffprobe(file)
+
+def process_file(file, probe_future=None):
+    probe = probe_future.result() if probe_future is not None else run_ffprobe(file)
+    parts = _partition(probe)
     print(f"\nAnalyzing: {os.path.basename(file)}")
     print("=== Summary ===")
-    print(summarize(streams))
+    print(summarize(parts))
     print()
 
-    plan = apply_rules(streams)
+    plan = apply_rules(parts)
 
     # Auto-skip if no changes would be made
     if not plan["notes"] and plan["audio_new_ac3"] is None:
@@ -375,11 +614,12 @@ def process_file(file):
     print("=== ffmpeg command (dry-run) ===")
     print(" ".join(quote_arg(a) for a in cmd))
     print()
+    explanation, resulting = render_plan(parts, plan)
     print("=== Command explanation ===")
-    print(explain_command(cmd, plan))
+    print(explanation)
     print()
     print("=== Resulting streams (dry-run) ===")
-    print(summarize_resulting_plan(streams, plan))
+    print(resulting)
     print("\n" + "-"*72)
 
     while True:
@@ -399,10 +639,7 @@ def process_file(file):
 
     # B4: run mediainfo.py on input file (by filename; mediainfo.py does the directory search)
     try:
-        b4 = subprocess.check_output(
-            ["python3", mediainfo_path, filename_only],
-            text=True
-        )
+        b4 = run_mediainfo(mediainfo_path, filename_only)
     except subprocess.CalledProcessError as e:
         b4 = f"(mediainfo.py failed on input file: {e})"
 
@@ -412,8 +649,8 @@ def process_file(file):
             os.remove(outfile)
 
         print(f"\nReencoding '{file}' → '{outfile}' ...")
-        proc = subprocess.run(cmd, text=True)
-        if proc.returncode != 0 or not os.path.exists(outfile):
+        returncode = run_reencode(cmd, total_ms=_duration_ms_from_probe(probe))
+        if returncode != 0 or not os.path.exists(outfile):
             print("ffmpeg reported an error or output file was not created.")
             print("The output file failed validation checks.")
             print("Retry the reencode operation? (Y/N)")
@@ -428,10 +665,7 @@ def process_file(file):
         # AFTR: run mediainfo.py on output file (by its new filename)
         out_name_only = os.path.basename(outfile)
         try:
-            aftr = subprocess.check_output(
-                ["python3", mediainfo_path, out_name_only],
-                text=True
-            )
+            aftr = run_mediainfo(mediainfo_path, out_name_only)
         except subprocess.CalledProcessError as e:
             aftr = f"(mediainfo.py failed on output file: {e})"
 
@@ -442,7 +676,8 @@ def process_file(file):
         print(aftr)
 
         # Validation
-        passed, msg = validate_output_file(file, outfile)
+        passed, msg = validate_output_file(file, outfile, full_decode=plan["audio_new_ac3"] is not None,
+                                           input_probe=probe)
         if passed:
             print("\nThe output file has passed validation checks.")
             print(f"Details: {msg}")
@@ -476,16 +711,27 @@ def process_file(file):
         # If we get here after a failed validation and user chose retry, loop continues
 
 def main(directory):
-    files = sorted(
-        os.path.join(directory, f)
-        for f in os.listdir(directory)
-        if f.lower().endswith(MEDIA_EXTENSIONS)
-    )
+    # DirEntry.is_file() uses the type from the directory read, and only
+    # stats symlinks, which are kept when they point at files. Dotfiles
+    # (e.g. macOS "._name.mkv" resource forks) are skipped.
+    with os.scandir(directory) as it:
+        files = sorted(
+            e.path for e in it
+            if not e.name.startswith(".")
+            and os.path.splitext(e.name)[1].lower() in _MEDIA_EXT_SET
+            and e.is_file()
+        )
     if not files:
         print("No media files found in:", directory)
         return
-    for file in files:
-        process_file(file)
+    # Probe every file up front in the background; the interactive loop stays serial
+    pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+    try:
+        probes = {file: pool.submit(run_ffprobe, file) for file in files}
+        for file in files:
+            process_file(file, probes[file])
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     if len(sys.argv) != 2: